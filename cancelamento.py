@@ -0,0 +1,77 @@
+# ===================================================================
+# app/cancelamento.py (Cancelamento Cooperativo da Análise)
+#
+# O que faz:
+# - TOKEN DE CANCELAMENTO: Um objeto compartilhado entre a interface
+#   e a thread que executa a análise. A interface chama `cancelar()`;
+#   o OCR, a extração e a consolidação chamam `verificar()` entre
+#   páginas, entre chunks e a cada pedaço da resposta da IA, e param
+#   em poucos segundos.
+# - ESPERA INTERROMPÍVEL: `aguardar()` substitui o `time.sleep` entre
+#   chamadas à API, retornando imediatamente se houver cancelamento.
+# - SINAL DE VIDA: Com `tempo_max_sem_sinal`, a interface chama
+#   `sinalizar()` a cada atualização da tela. Se a sessão do navegador
+#   terminar (aba fechada, sessão expirada), os sinais param e o token
+#   se cancela sozinho, liberando a thread e a cota da API.
+# ===================================================================
+
+import time
+import threading
+
+# Motivos de cancelamento.
+MOTIVO_USUARIO = "usuario"
+MOTIVO_SEM_SINAL = "sem_sinal"
+
+_MENSAGENS = {
+    MOTIVO_USUARIO: "Análise cancelada pelo usuário.",
+    MOTIVO_SEM_SINAL: "Análise cancelada automaticamente: a interface parou de acompanhar o processamento.",
+}
+
+
+class AnaliseCancelada(Exception):
+    """Levantada quando a análise em andamento é cancelada (pelo usuário ou por falta de sinal da interface)."""
+
+    def __init__(self, motivo=MOTIVO_USUARIO):
+        super().__init__(_MENSAGENS[motivo])
+        self.motivo = motivo
+
+
+class TokenCancelamento:
+    """Sinaliza, de forma segura entre threads, que a análise deve parar."""
+
+    def __init__(self, tempo_max_sem_sinal=None):
+        self._evento = threading.Event()
+        self.motivo = None
+        self._tempo_max_sem_sinal = tempo_max_sem_sinal
+        self._ultimo_sinal = time.monotonic()
+
+    def sinalizar(self):
+        """Registra que a interface ainda está acompanhando a análise."""
+        self._ultimo_sinal = time.monotonic()
+
+    def cancelar(self, motivo=MOTIVO_USUARIO):
+        """Solicita o cancelamento da análise, registrando o motivo do primeiro pedido."""
+        if not self._evento.is_set():
+            self.motivo = motivo
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        if (
+            not self._evento.is_set()
+            and self._tempo_max_sem_sinal is not None
+            and time.monotonic() - self._ultimo_sinal > self._tempo_max_sem_sinal
+        ):
+            print("⛔ A interface parou de acompanhar a análise. Cancelando...")
+            self.cancelar(MOTIVO_SEM_SINAL)
+        return self._evento.is_set()
+
+    def verificar(self):
+        """Levanta `AnaliseCancelada` se o cancelamento foi solicitado."""
+        if self.cancelado:
+            raise AnaliseCancelada(self.motivo or MOTIVO_USUARIO)
+
+    def aguardar(self, segundos):
+        """Espera até `segundos`, interrompendo a espera se houver cancelamento."""
+        self._evento.wait(segundos)
+        self.verificar()
@@ -19,11 +19,16 @@
 # ===================================================================
 
 import os
-import json
 import time
 import traceback
 import google.generativeai as genai
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from json_incremental import AnalisadorJSONIncremental, ErroJSONIncremental
+from cancelamento import AnaliseCancelada
+from orcamento_tokens import (
+    FATOR_REDUCAO_CONSOLIDACAO, MAX_NIVEIS_CONSOLIDACAO, TOKENS_MAX_CONSOLIDACAO, TOKENS_POR_CHAMADA,
+    calcular_tamanho_chunk, compactar_json, contar_tokens, estimar_tokens, medir_caracteres_por_token,
+)
 
 # --- Configuração da API do Gemini ---
 api_key = os.getenv("GEMINI_API_KEY")
@@ -38,6 +43,13 @@ generation_config = {
     "response_mime_type": "application/json",
 }
 
+# --- Configuração de Streaming ---
+# Com streaming, a resposta é validada à medida que chega: JSON malformado
+# aborta a chamada na hora e uma nova tentativa é feita. Respostas cortadas
+# pelo limite de tokens de saída (MAX_TOKENS) não são repetidas.
+USAR_STREAMING = True
+MAX_TENTATIVAS = 2
+
 # --- FASE 1: PROMPT DE EXTRAÇÃO DE DADOS BRUTOS ---
 PROMPT_EXTRACAO = """
 Você é um assistente de extração de dados. Analise o TRECHO de um processo trabalhista e extraia TODAS as informações relevantes que encontrar. Foque em capturar os dados como eles aparecem. Retorne os dados em um formato JSON simples.
@@ -127,14 +139,116 @@ Você é um especialista sênior em Direito do Trabalho no Brasil, com a tarefa
 **LISTA DE DADOS BRUTOS EXTRAÍDOS:**
 """
 
-def dividir_em_chunks(texto):
-    """Divide o texto em pedaços menores para análise."""
-    splitter = RecursiveCharacterTextSplitter(chunk_size=12000, chunk_overlap=500, separators=["\n\n", "\n", ".", " "])
+def dividir_em_chunks(texto, tokens_por_chamada=TOKENS_POR_CHAMADA):
+    """
+    Divide o texto em pedaços menores para análise.
+
+    O tamanho do chunk é ajustado para que cada chamada `PROMPT_EXTRACAO + chunk`
+    fique próxima de `tokens_por_chamada` tokens, usando a razão caracteres/token
+    medida em uma amostra do próprio documento.
+    """
+    model = genai.GenerativeModel(MODELO_ANALISE)
+    caracteres_por_token = medir_caracteres_por_token(model, texto)
+    tokens_prompt = estimar_tokens(PROMPT_EXTRACAO, caracteres_por_token)
+    tamanho_chunk = calcular_tamanho_chunk(tokens_por_chamada, tokens_prompt, caracteres_por_token)
+    print(f"   - Chunks de {tamanho_chunk} caracteres (~{tokens_por_chamada} tokens por chamada, "
+          f"{caracteres_por_token:.2f} caracteres/token).")
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=tamanho_chunk, chunk_overlap=tamanho_chunk // 24, separators=["\n\n", "\n", ".", " "]
+    )
     return splitter.split_text(texto)
 
-def extrair_dados_parciais(text_chunks, st_progress_bar=None):
+class LimiteTokensSaidaError(ErroJSONIncremental):
+    """A resposta foi cortada pelo limite de tokens de saída (`finish_reason` MAX_TOKENS)."""
+
+def _texto_do_pedaco(pedaco):
+    """Retorna o texto de um pedaço da resposta (pedaços finais podem vir sem texto)."""
+    try:
+        return pedaco.text
+    except ValueError:
+        return ""
+
+def _motivo_fim(pedaco):
+    """Retorna o nome do `finish_reason` do pedaço, se houver."""
+    candidatos = getattr(pedaco, "candidates", None)
+    if not candidatos:
+        return None
+    motivo = getattr(candidatos[0], "finish_reason", None)
+    return getattr(motivo, "name", motivo)
+
+def gerar_json(model, prompt, ao_receber_parcial=None, streaming=USAR_STREAMING, max_tentativas=MAX_TENTATIVAS,
+               token=None, relatorio=None, etapa="Chamada"):
+    """
+    Chama o modelo e devolve a resposta já convertida em JSON.
+
+    No modo streaming, a resposta é validada pedaço a pedaço: ao primeiro
+    erro estrutural, a chamada é abortada e repetida até `max_tentativas`
+    vezes. Respostas cortadas pelo limite de tokens de saída (MAX_TOKENS) não
+    são repetidas, pois a mesma chamada seria cortada de novo.
+
+    Args:
+        model: O modelo Gemini.
+        prompt (str): O prompt completo.
+        ao_receber_parcial (callable | None): Chamado com o objeto parcial
+            sempre que um novo pedaço válido chega (apenas com streaming).
+        streaming (bool): Se a resposta deve ser consumida incrementalmente.
+        max_tentativas (int): Número máximo de chamadas ao modelo.
+        token (TokenCancelamento | None): Verificado a cada pedaço recebido;
+            o cancelamento interrompe a resposta em andamento.
+        relatorio (RelatorioTokens | None): Recebe os tokens e a latência de
+            cada tentativa, identificada por `etapa`.
+
+    Raises:
+        ErroJSONIncremental: Se todas as tentativas retornarem JSON inválido.
+        LimiteTokensSaidaError: Se a resposta atingir o limite de tokens de saída.
+        AnaliseCancelada: Se o cancelamento for solicitado pelo `token`.
+    """
+    for tentativa in range(1, max_tentativas + 1):
+        analisador = AnalisadorJSONIncremental()
+        if token:
+            token.verificar()
+        resposta, status = None, "Falha"
+        inicio = time.perf_counter()
+        try:
+            resposta = model.generate_content(prompt, generation_config=generation_config, stream=streaming)
+            for pedaco in (resposta if streaming else [resposta]):
+                if token:
+                    token.verificar()
+                analisador.alimentar(_texto_do_pedaco(pedaco))
+                if _motivo_fim(pedaco) == "MAX_TOKENS":
+                    raise LimiteTokensSaidaError(
+                        "Resposta truncada pelo limite de tokens de saída do modelo.", analisador.texto, truncado=True
+                    )
+                if streaming and ao_receber_parcial:
+                    parcial = analisador.parcial()
+                    if parcial:
+                        ao_receber_parcial(parcial)
+            resultado = analisador.finalizar()
+            status = "Sucesso"
+            return resultado
+        except ErroJSONIncremental as e:
+            # Repetir a mesma chamada seria cortado no mesmo ponto: só erros estruturais são repetidos.
+            if tentativa == max_tentativas or isinstance(e, LimiteTokensSaidaError):
+                raise
+            print(f"⚠️  Resposta inválida na tentativa {tentativa}/{max_tentativas} ({e}). Repetindo...")
+        except AnaliseCancelada:
+            status = "Cancelada"
+            raise
+        finally:
+            if relatorio is not None and resposta is not None:
+                relatorio.registrar_resposta(
+                    etapa, resposta, prompt, analisador.texto, time.perf_counter() - inicio, status
+                )
+
+def extrair_dados_parciais(text_chunks, st_progress_bar=None, ao_receber_parcial=None, token=None, relatorio=None):
     """
     FASE 1: Coleta dados brutos de cada chunk de forma flexível.
+
+    `ao_receber_parcial(numero_chunk, dados)` é chamado com os dados parciais
+    de cada chunk à medida que a resposta da IA chega e com o resultado final
+    do chunk ao concluí-lo. Se `token` for cancelado, levanta `AnaliseCancelada`.
+    O consumo de tokens de cada chamada é registrado em `relatorio`.
     """
     log_detalhado = []
     model = genai.GenerativeModel(MODELO_ANALISE)
@@ -146,39 +260,93 @@ def extrair_dados_parciais(text_chunks, st_progress_bar=None):
 
         prompt_completo = PROMPT_EXTRACAO + "\n" + chunk.strip()
         
+        ao_receber_parcial_chunk = None
+        if ao_receber_parcial:
+            ao_receber_parcial_chunk = lambda dados, numero=i + 1: ao_receber_parcial(numero, dados)
+
         try:
-            resposta = model.generate_content(prompt_completo, generation_config=generation_config)
-            resultado_json = json.loads(resposta.text)
+            resultado_json = gerar_json(
+                model, prompt_completo, ao_receber_parcial_chunk,
+                token=token, relatorio=relatorio, etapa=f"Extração - parte {i + 1}"
+            )
             log_detalhado.append({"status": "Sucesso", "chunk": i + 1, "resultado_recebido": resultado_json})
+            if ao_receber_parcial_chunk:
+                ao_receber_parcial_chunk(resultado_json)
         
-        except (json.JSONDecodeError, Exception) as e:
-            resposta_bruta = "N/A"
-            if 'resposta' in locals() and hasattr(resposta, 'text'):
-                resposta_bruta = resposta.text
+        except AnaliseCancelada:
+            raise
+        except Exception as e:
+            resposta_bruta = getattr(e, "resposta_bruta", None) or "N/A"
             log_detalhado.append({"status": "Falha", "chunk": i + 1, "erro": str(e), "resposta_bruta": resposta_bruta})
         
-        time.sleep(1) 
+        if token:
+            token.aguardar(1)
+        else:
+            time.sleep(1)
 
     return log_detalhado
 
-def consolidar_resultados(resultados_parciais_sucesso):
+def _consolidar(model, resultados, ao_receber_parcial, token, relatorio, nivel=0, tokens_anteriores=None):
+    """
+    Monta e executa a chamada de consolidação dentro do orçamento de tokens.
+
+    Se o payload exceder `TOKENS_MAX_CONSOLIDACAO`, os resultados são divididos
+    ao meio, cada metade é consolidada separadamente e os dois resultados
+    intermediários são consolidados em seguida. A divisão não é feita se
+    restar um único resultado, após `MAX_NIVEIS_CONSOLIDACAO` níveis, quando
+    cada metade seria um único resultado já consolidado ou quando a rodada
+    anterior não reduziu o payload; nesses casos a chamada é feita assim
+    mesmo, com um aviso indicando o motivo.
+    """
+    prompt_completo = PROMPT_CONSOLIDACAO + "\n" + compactar_json(resultados)
+    tokens_prompt, _ = contar_tokens(model, prompt_completo)
+
+    if tokens_prompt > TOKENS_MAX_CONSOLIDACAO:
+        # `tokens_anteriores` só é informado na chamada que junta resultados intermediários.
+        ja_consolidados = tokens_anteriores is not None
+        if len(resultados) == 1:
+            motivo = "há um único resultado, que não pode ser dividido"
+        elif nivel >= MAX_NIVEIS_CONSOLIDACAO:
+            motivo = f"o limite de {MAX_NIVEIS_CONSOLIDACAO} níveis de divisão foi atingido"
+        elif ja_consolidados and len(resultados) <= 2:
+            motivo = "cada metade seria um único resultado já consolidado"
+        elif ja_consolidados and tokens_prompt > tokens_anteriores * FATOR_REDUCAO_CONSOLIDACAO:
+            motivo = "a divisão anterior não reduziu o payload o suficiente"
+        else:
+            print(f"⚠️  Consolidação de {len(resultados)} resultados usaria {tokens_prompt} tokens "
+                  f"(orçamento: {TOKENS_MAX_CONSOLIDACAO}). Consolidando em duas metades...")
+            meio = len(resultados) // 2
+            intermediarios = [
+                _consolidar(model, metade, None, token, relatorio, nivel + 1)
+                for metade in (resultados[:meio], resultados[meio:])
+            ]
+            return _consolidar(model, intermediarios, ao_receber_parcial, token, relatorio, nivel, tokens_prompt)
+        print(f"⚠️  Consolidação de {len(resultados)} resultado(s) usará {tokens_prompt} tokens, acima do orçamento "
+              f"({TOKENS_MAX_CONSOLIDACAO}), pois {motivo}.")
+
+    etapa = "Consolidação" if nivel == 0 else f"Consolidação intermediária (nível {nivel})"
+    return gerar_json(model, prompt_completo, ao_receber_parcial, token=token, relatorio=relatorio, etapa=etapa)
+
+def consolidar_resultados(resultados_parciais_sucesso, ao_receber_parcial=None, token=None, relatorio=None):
     """
     FASE 2: Consolida, limpa, corrige e estrutura os dados brutos no formato final.
+
+    `ao_receber_parcial(dados)` é chamado com o resultado consolidado parcial
+    à medida que a resposta da IA chega. Se `token` for cancelado, levanta
+    `AnaliseCancelada`. O consumo de tokens é registrado em `relatorio`.
     """
     if not resultados_parciais_sucesso:
         print("⚠️ Nenhum resultado parcial de sucesso foi recebido para consolidação.")
         return None
 
     model = genai.GenerativeModel(MODELO_ANALISE)
-    
-    json_parciais_str = json.dumps(resultados_parciais_sucesso, indent=2, ensure_ascii=False)
-    prompt_completo = PROMPT_CONSOLIDACAO + "\n" + json_parciais_str
 
     try:
-        resposta = model.generate_content(prompt_completo, generation_config=generation_config)
-        resultado_final_json = json.loads(resposta.text)
+        resultado_final_json = _consolidar(model, resultados_parciais_sucesso, ao_receber_parcial, token, relatorio)
         return resultado_final_json
-    except (json.JSONDecodeError, Exception) as e:
+    except AnaliseCancelada:
+        raise
+    except Exception as e:
         print(f"❌ Erro crítico na etapa de consolidação final: {e}")
         traceback.print_exc()
         return None
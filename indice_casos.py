@@ -0,0 +1,224 @@
+# ===================================================================
+# app/indice_casos.py (Índice Local de Processos Analisados)
+#
+# O que faz:
+# - PERSISTÊNCIA: Todo JSON consolidado é gravado em um banco SQLite
+#   local, em vez de existir apenas no `st.session_state`.
+# - BUSCA INSTANTÂNEA: Índices por número do processo e CPF do
+#   reclamante (somente dígitos) e busca textual (FTS5) sobre número,
+#   CPF, reclamante, reclamadas e pleitos/verbas.
+# - REEXPORTAÇÃO: Um caso encontrado pode gerar novamente o XML do
+#   PJe-Calc e o resumo em Word sem OCR e sem chamar a IA.
+#
+# Uso pela linha de comando:
+#   python indice_casos.py buscar "0001234-56.2023.5.02.0001"
+#   python indice_casos.py exportar 12 --xml export/caso.xml --docx export/caso.docx
+# ===================================================================
+
+import os
+import re
+import json
+import sqlite3
+import argparse
+from contextlib import closing
+from datetime import datetime
+
+CAMINHO_INDICE = os.getenv("PJECALC_INDICE", os.path.join("export", "casos.db"))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS casos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    numero_processo TEXT,
+    numero_normalizado TEXT UNIQUE,
+    cpf_reclamante TEXT,
+    cpf_normalizado TEXT,
+    reclamante TEXT,
+    reclamadas TEXT,
+    arquivo_origem TEXT,
+    analisado_em TEXT NOT NULL,
+    dados_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_casos_cpf ON casos (cpf_normalizado);
+CREATE INDEX IF NOT EXISTS idx_casos_analisado_em ON casos (analisado_em);
+CREATE VIRTUAL TABLE IF NOT EXISTS casos_fts USING fts5 (
+    numero_processo, cpf_reclamante, reclamante, reclamadas, pleitos_e_verbas,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+_COLUNAS_RESUMO = "c.id, c.numero_processo, c.cpf_reclamante, c.reclamante, c.reclamadas, c.arquivo_origem, c.analisado_em"
+
+
+def _somente_digitos(valor):
+    """Mantém apenas os dígitos de um número de processo ou CPF."""
+    digitos = re.sub(r"\D", "", str(valor or ""))
+    return digitos or None
+
+
+def _texto(valor):
+    """Converte qualquer valor vindo da IA em texto pesquisável."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return str(valor)
+
+
+def conectar(caminho=CAMINHO_INDICE):
+    """Abre (e cria, se necessário) o banco de casos analisados."""
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    conexao = sqlite3.connect(caminho)
+    conexao.row_factory = sqlite3.Row
+    conexao.executescript(_ESQUEMA)
+    return conexao
+
+
+def salvar_caso(dados, arquivo_origem=None, caminho=CAMINHO_INDICE):
+    """
+    Grava (ou atualiza, se o número do processo já existir) um caso consolidado.
+
+    Args:
+        dados (dict): O JSON consolidado retornado por `consolidar_resultados`.
+        arquivo_origem (str | None): Nome do PDF analisado.
+        caminho (str): Caminho do banco SQLite.
+
+    Returns:
+        int: O id do caso no índice.
+    """
+    dados_proc = dados.get("dados_processuais") or {}
+    partes = dados.get("partes") or {}
+    numero = _texto(dados_proc.get("numero_processo"))
+    cpf = _texto(partes.get("cpf_reclamante"))
+    reclamante = _texto(partes.get("reclamante"))
+    reclamadas = "; ".join(_texto(r) for r in (partes.get("reclamadas") or []) if r)
+    verbas = "\n".join(
+        f"{_texto(p.get('verba'))} {_texto(p.get('parametros'))}"
+        for p in (dados.get("pleitos_e_verbas") or [])
+        if isinstance(p, dict)
+    )
+
+    with closing(conectar(caminho)) as conexao:
+        with conexao:
+            cursor = conexao.execute(
+                """
+                INSERT INTO casos (numero_processo, numero_normalizado, cpf_reclamante, cpf_normalizado,
+                                   reclamante, reclamadas, arquivo_origem, analisado_em, dados_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (numero_normalizado) DO UPDATE SET
+                    numero_processo = excluded.numero_processo,
+                    cpf_reclamante = excluded.cpf_reclamante,
+                    cpf_normalizado = excluded.cpf_normalizado,
+                    reclamante = excluded.reclamante,
+                    reclamadas = excluded.reclamadas,
+                    arquivo_origem = excluded.arquivo_origem,
+                    analisado_em = excluded.analisado_em,
+                    dados_json = excluded.dados_json
+                RETURNING id
+                """,
+                (
+                    numero, _somente_digitos(numero), cpf, _somente_digitos(cpf), reclamante, reclamadas,
+                    arquivo_origem, datetime.now().isoformat(timespec="seconds"),
+                    json.dumps(dados, ensure_ascii=False),
+                ),
+            )
+            id_caso = cursor.fetchone()["id"]
+            conexao.execute("DELETE FROM casos_fts WHERE rowid = ?", (id_caso,))
+            conexao.execute(
+                "INSERT INTO casos_fts (rowid, numero_processo, cpf_reclamante, reclamante, reclamadas, pleitos_e_verbas) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_caso, numero, cpf, reclamante, reclamadas, verbas),
+            )
+    print(f"✅ Caso gravado no índice local (id {id_caso}).")
+    return id_caso
+
+
+def buscar_casos(termo, limite=20, caminho=CAMINHO_INDICE):
+    """
+    Procura casos por número do processo, CPF, partes ou verbas.
+
+    Números de processo e CPFs (com ou sem pontuação) usam os índices exatos;
+    demais termos usam a busca textual.
+
+    Returns:
+        list[dict]: Resumo dos casos encontrados, por relevância (busca textual)
+        ou mais recentes primeiro.
+    """
+    termo = (termo or "").strip()
+    if not os.path.exists(caminho):
+        return []
+
+    with closing(conectar(caminho)) as conexao:
+        if not termo:
+            linhas = conexao.execute(
+                f"SELECT {_COLUNAS_RESUMO} FROM casos c ORDER BY analisado_em DESC LIMIT ?", (limite,)
+            ).fetchall()
+        else:
+            linhas = []
+            digitos = _somente_digitos(termo)
+            if digitos and len(digitos) >= 11:
+                linhas = conexao.execute(
+                    f"SELECT {_COLUNAS_RESUMO} FROM casos c WHERE numero_normalizado = ? OR cpf_normalizado = ? "
+                    "ORDER BY analisado_em DESC LIMIT ?",
+                    (digitos, digitos, limite),
+                ).fetchall()
+            if not linhas:
+                tokens = re.findall(r"\w+", termo)
+                consulta_fts = " ".join(f'"{token}"*' for token in tokens)
+                if consulta_fts:
+                    linhas = conexao.execute(
+                        f"SELECT {_COLUNAS_RESUMO} FROM casos_fts JOIN casos c ON c.id = casos_fts.rowid "
+                        "WHERE casos_fts MATCH ? ORDER BY rank LIMIT ?",
+                        (consulta_fts, limite),
+                    ).fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+def carregar_caso(id_caso, caminho=CAMINHO_INDICE):
+    """Retorna o JSON consolidado de um caso do índice, ou None se não existir."""
+    with closing(conectar(caminho)) as conexao:
+        linha = conexao.execute("SELECT dados_json FROM casos WHERE id = ?", (id_caso,)).fetchone()
+    return json.loads(linha["dados_json"]) if linha else None
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Consulta o índice local de processos analisados.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    buscar = subcomandos.add_parser("buscar", help="Busca casos por número, CPF, partes ou verbas.")
+    buscar.add_argument("termo", nargs="?", default="")
+    buscar.add_argument("--limite", type=int, default=20)
+
+    exportar = subcomandos.add_parser("exportar", help="Gera novamente XML/DOCX/JSON de um caso.")
+    exportar.add_argument("id_caso", type=int)
+    exportar.add_argument("--xml", default=os.path.join("export", "saida_pjecalc.xml"))
+    exportar.add_argument("--docx", default=os.path.join("export", "resumo_processo.docx"))
+    exportar.add_argument("--json")
+
+    args = parser.parse_args()
+
+    if args.comando == "buscar":
+        casos = buscar_casos(args.termo, args.limite)
+        if not casos:
+            print("Nenhum caso encontrado.")
+        for caso in casos:
+            print(f"[{caso['id']}] {caso['numero_processo'] or 'Sem número'} | {caso['reclamante'] or 'N/A'} "
+                  f"x {caso['reclamadas'] or 'N/A'} | analisado em {caso['analisado_em']}")
+    elif args.comando == "exportar":
+        from xml_generator import gerar_xml_pjecalc
+        from exportador_docx import gerar_docx_resumo
+
+        dados = carregar_caso(args.id_caso)
+        if dados is None:
+            parser.error(f"Caso {args.id_caso} não encontrado no índice.")
+        gerar_xml_pjecalc(dados, args.xml)
+        gerar_docx_resumo(dados, args.docx)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(dados, f, indent=2, ensure_ascii=False)
+            print(f"✅ JSON gravado em: {args.json}")
+
+
+if __name__ == "__main__":
+    _main()
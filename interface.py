@@ -16,17 +16,28 @@
 import streamlit as st
 import os
 import json
+import time
+import threading
 import traceback
 import pandas as pd
 from ocr import aplicar_ocr
+from secoes import SECOES, SECOES_PADRAO, mapear_secoes, resumir_secoes, selecionar_paginas
 from extrator import dividir_em_chunks, extrair_dados_parciais, consolidar_resultados
 from xml_generator import gerar_xml_pjecalc
 from exportador_docx import gerar_docx_resumo
+from indice_casos import buscar_casos, carregar_caso, salvar_caso
+from cancelamento import MOTIVO_SEM_SINAL, AnaliseCancelada, TokenCancelamento
+from orcamento_tokens import RelatorioTokens
 
 # --- CONFIGURAÇÃO DA PÁGINA E ESTADO INICIAL ---
 
 st.set_page_config(page_title="PJe-Calc Automático com IA", layout="wide")
 
+# Intervalo (em segundos) entre atualizações da tela enquanto a análise roda.
+INTERVALO_ATUALIZACAO = 0.5
+# Sem atualizações da tela por este tempo (sessão encerrada), a análise se cancela sozinha.
+TEMPO_MAX_SEM_ACOMPANHAMENTO = 20 * INTERVALO_ATUALIZACAO
+
 def inicializar_estado():
     """Define o estado inicial da aplicação se não existir."""
     if "estado_app" not in st.session_state:
@@ -40,9 +51,20 @@ def inicializar_estado():
         st.session_state.error_message = None
     if "error_details" not in st.session_state:
         st.session_state.error_details = None
+    if "mapa_secoes" not in st.session_state:
+        st.session_state.mapa_secoes = None
+    if "paginas_selecionadas" not in st.session_state:
+        st.session_state.paginas_selecionadas = None
+    if "relatorio_tokens" not in st.session_state:
+        st.session_state.relatorio_tokens = None
 
 def reiniciar_analise():
     """Limpa o session_state e reseta a aplicação para o estado inicial."""
+    # Interrompe uma análise em andamento para liberar a thread e a cota da API.
+    analise = st.session_state.get("analise_em_andamento")
+    if analise:
+        analise["token"].cancelar()
+
     keys_to_clear = list(st.session_state.keys())
     for key in keys_to_clear:
         del st.session_state[key]
@@ -55,42 +77,172 @@ def reiniciar_analise():
 
 # --- FUNÇÕES DE LÓGICA DA APLICAÇÃO ---
 
-def executar_analise_completa(caminho_pdf):
-    """Orquestra todo o processo de OCR, extração e consolidação."""
+class _BarraProgressoCompartilhada:
+    """Recebe as chamadas de `progress()` de `extrair_dados_parciais` e as grava no estado compartilhado."""
+
+    def __init__(self, estado):
+        self.estado = estado
+
+    def progress(self, fracao, text=None):
+        self.estado.update(fracao=fracao, mensagem=text)
+
+def _executar_analise(caminho_pdf, paginas, nome_arquivo, token, relatorio, estado):
+    """
+    Executa OCR, extração e consolidação em uma thread separada.
+
+    Não usa `st`: toda a comunicação com a interface é feita pelo dicionário
+    `estado`, lido a cada atualização da tela.
+    """
     try:
-        with st.spinner("🔍 Etapa 1/3: Lendo e preparando o documento..."):
-            texto = aplicar_ocr(caminho_pdf)
-            chunks = dividir_em_chunks(texto)
-        st.success(f"✅ Documento preparado e dividido em {len(chunks)} partes.")
-
-        progresso_extracaao = st.progress(0, text="Analisando parte 1...")
-        with st.spinner(f"🤖 Etapa 2/3: Extraindo dados de cada uma das {len(chunks)} partes..."):
-            log_detalhado_chunks = extrair_dados_parciais(chunks, progresso_extracaao)
-            st.session_state.log_detalhado = log_detalhado_chunks
-            
-            resultados_parciais_sucesso = [
-                item.get("resultado_recebido")
-                for item in log_detalhado_chunks
-                if isinstance(item, dict) and item.get("status") == "Sucesso"
-            ]
+        estado.update(etapa="🔍 Etapa 1/3: Lendo e preparando o documento...", fracao=0.0)
 
-            if not resultados_parciais_sucesso:
-                raise ValueError("A extração de dados parciais falhou. Não foi possível encontrar informações nos pedaços do documento.")
-        st.success("✅ Extração de dados parciais concluída.")
+        def registrar_pagina(processadas, total):
+            estado.update(fracao=processadas / total, mensagem=f"Página {processadas} de {total}")
 
-        with st.spinner("🧠 Etapa 3/3: Consolidando dados e gerando resumo..."):
-            dados_completos = consolidar_resultados(resultados_parciais_sucesso)
-            if not dados_completos or not isinstance(dados_completos, dict):
-                raise ValueError("A etapa de consolidação final falhou. A IA não conseguiu combinar os resultados parciais.")
-            
-            st.session_state.dados_completos = dados_completos
-        st.success("🎉 Análise finalizada com sucesso!")
-        st.session_state.estado_app = "finalizado"
+        texto = aplicar_ocr(caminho_pdf, paginas, token, registrar_pagina)
+        if not texto.strip():
+            raise ValueError("Nenhum texto foi extraído das páginas selecionadas.")
+        chunks = dividir_em_chunks(texto)
+
+        estado.update(
+            etapa=f"🤖 Etapa 2/3: Extraindo dados de cada uma das {len(chunks)} partes...",
+            fracao=0.0, mensagem="Analisando parte 1..."
+        )
+
+        def registrar_achado(numero_chunk, dados):
+            estado["achados"][numero_chunk] = dados
+
+        log_detalhado_chunks = extrair_dados_parciais(
+            chunks, _BarraProgressoCompartilhada(estado), registrar_achado, token, relatorio
+        )
+        estado["log_detalhado"] = log_detalhado_chunks
+
+        resultados_parciais_sucesso = [
+            item.get("resultado_recebido")
+            for item in log_detalhado_chunks
+            if isinstance(item, dict) and item.get("status") == "Sucesso"
+        ]
+        if not resultados_parciais_sucesso:
+            raise ValueError("A extração de dados parciais falhou. Não foi possível encontrar informações nos pedaços do documento.")
+
+        estado.update(etapa="🧠 Etapa 3/3: Consolidando dados e gerando resumo...", fracao=None, mensagem=None)
+
+        def registrar_consolidacao(dados):
+            estado["consolidado_parcial"] = dados
+
+        dados_completos = consolidar_resultados(resultados_parciais_sucesso, registrar_consolidacao, token, relatorio)
+        if not dados_completos or not isinstance(dados_completos, dict):
+            raise ValueError("A etapa de consolidação final falhou. A IA não conseguiu combinar os resultados parciais.")
+        estado["dados_completos"] = dados_completos
+
+        # Uma falha ao gravar no índice local não deve invalidar a análise.
+        try:
+            salvar_caso(dados_completos, nome_arquivo)
+        except Exception as e:
+            print(f"⚠️  Não foi possível gravar o caso no índice local: {e}")
+
+        estado["status"] = "finalizado"
 
+    except AnaliseCancelada as e:
+        print(f"⛔ {e}")
+        estado.update(status="cancelado", motivo_cancelamento=e.motivo)
     except Exception as e:
+        estado.update(status="erro", erro=str(e), detalhes=traceback.format_exc())
+    finally:
+        if relatorio.chamadas:
+            print(relatorio.resumo())
+
+def exibir_progresso_analise(analise):
+    """Mostra a etapa atual, o progresso por página/parte e os resultados parciais já recebidos."""
+    estado = analise["estado"]
+
+    st.subheader(estado["etapa"])
+    if estado["fracao"] is not None:
+        st.progress(min(estado["fracao"], 1.0), text=estado["mensagem"] or "")
+    else:
+        st.caption("⏳ Aguardando a resposta da IA...")
+
+    totais = analise["relatorio"].totais()
+    if totais["chamadas"]:
+        st.caption(f"📊 {totais['chamadas']} chamadas à IA · {totais['tokens_total']:,} tokens · "
+                   f"{totais['latencia_total_s']}s".replace(",", "."))
+
+    if analise["token"].cancelado:
+        st.warning("Cancelando... a análise será interrompida em instantes.")
+    elif st.button("⛔ Cancelar Análise", use_container_width=True):
+        analise["token"].cancelar()
+        st.rerun()
+
+    if estado["consolidado_parcial"]:
+        with st.expander("🧠 Resultado consolidado (parcial)", expanded=True):
+            st.json(estado["consolidado_parcial"])
+
+    achados = dict(estado["achados"])
+    if achados:
+        with st.expander(f"👀 Dados parciais recebidos da IA ({len(achados)} partes)", expanded=estado["consolidado_parcial"] is None):
+            for numero_chunk in sorted(achados, reverse=True):
+                st.caption(f"Parte {numero_chunk}")
+                st.json(achados[numero_chunk], expanded=False)
+
+def executar_analise_completa(caminho_pdf, paginas=None):
+    """
+    Orquestra todo o processo de OCR, extração e consolidação.
+
+    A análise roda em uma thread separada; a cada execução do script esta
+    função mostra o progresso e, quando a thread termina, transfere o
+    resultado para o `session_state`.
+    """
+    analise = st.session_state.get("analise_em_andamento")
+    if analise is None:
+        token = TokenCancelamento(tempo_max_sem_sinal=TEMPO_MAX_SEM_ACOMPANHAMENTO)
+        relatorio = RelatorioTokens()
+        estado = {
+            "status": "executando", "etapa": "Iniciando a análise...", "fracao": 0.0, "mensagem": None,
+            "achados": {}, "consolidado_parcial": None, "log_detalhado": None,
+        }
+        thread = threading.Thread(
+            target=_executar_analise,
+            args=(caminho_pdf, paginas, st.session_state.get("nome_arquivo"), token, relatorio, estado),
+            daemon=True,
+        )
+        thread.start()
+        analise = {"thread": thread, "token": token, "relatorio": relatorio, "estado": estado}
+        st.session_state.analise_em_andamento = analise
+
+    estado = analise["estado"]
+    analise["token"].sinalizar()
+    if analise["thread"].is_alive():
+        exibir_progresso_analise(analise)
+        time.sleep(INTERVALO_ATUALIZACAO)
+        return
+
+    del st.session_state["analise_em_andamento"]
+    st.session_state.log_detalhado = estado["log_detalhado"]
+    st.session_state.relatorio_tokens = analise["relatorio"]
+
+    if estado["status"] == "finalizado":
+        st.session_state.dados_completos = estado["dados_completos"]
+        st.session_state.estado_app = "finalizado"
+    elif estado["status"] == "cancelado":
+        st.session_state.estado_app = "erro"
+        if estado.get("motivo_cancelamento") == MOTIVO_SEM_SINAL:
+            st.session_state.error_message = (
+                "⏱️ A análise foi interrompida automaticamente porque a página ficou sem atualizar por mais de "
+                f"{TEMPO_MAX_SEM_ACOMPANHAMENTO:.0f} segundos (aba fechada ou sessão expirada). Envie o documento novamente."
+            )
+        else:
+            st.session_state.error_message = "⛔ Análise cancelada pelo usuário."
+        st.session_state.error_details = None
+        # Preserva o que já havia sido extraído antes do cancelamento.
+        if not st.session_state.log_detalhado and estado["achados"]:
+            st.session_state.log_detalhado = [
+                {"status": "Parcial", "chunk": numero, "resultado_recebido": dados}
+                for numero, dados in sorted(estado["achados"].items())
+            ]
+    else:
         st.session_state.estado_app = "erro"
-        st.session_state.error_message = f"Ocorreu um erro durante o processamento: {str(e)}"
-        st.session_state.error_details = traceback.format_exc()
+        st.session_state.error_message = f"Ocorreu um erro durante o processamento: {estado.get('erro')}"
+        st.session_state.error_details = estado.get("detalhes")
 
 def format_key(key):
     """Formata uma chave de dicionário para um título legível."""
@@ -111,6 +263,27 @@ def formatar_parametros(param):
     return str(param)
 
 
+def exibir_consumo_tokens():
+    """Mostra os tokens e a latência de cada chamada à IA na última análise."""
+    relatorio = st.session_state.relatorio_tokens
+    if not relatorio or not relatorio.chamadas:
+        return
+    totais = relatorio.totais()
+    with st.expander("📊 Consumo de Tokens e Tempo da Análise"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Chamadas à IA", totais["chamadas"])
+        col2.metric("Tokens de Entrada", f"{totais['tokens_entrada']:,}".replace(",", "."))
+        col3.metric("Tokens de Saída", f"{totais['tokens_saida']:,}".replace(",", "."))
+        col4.metric("Tempo na API", f"{totais['latencia_total_s']} s")
+        if totais["estimado"]:
+            st.caption("Algumas contagens são estimativas locais (a API não informou o uso).")
+        df_chamadas = pd.DataFrame(relatorio.chamadas)
+        df_chamadas.rename(columns={
+            'etapa': 'Etapa', 'status': 'Status', 'tokens_entrada': 'Tokens de Entrada',
+            'tokens_saida': 'Tokens de Saída', 'latencia_s': 'Latência (s)', 'estimado': 'Estimado'
+        }, inplace=True)
+        st.dataframe(df_chamadas, use_container_width=True, hide_index=True)
+
 def exibir_resultados_formatados():
     """Mostra os resultados finais de forma elegante e profissional."""
     st.header("✅ Análise Concluída", divider="rainbow")
@@ -236,10 +409,85 @@ def exibir_resultados_formatados():
     except Exception as e:
         st.error(f"Ocorreu um erro ao gerar os arquivos para download: {e}")
 
+    exibir_consumo_tokens()
+
     if st.session_state.log_detalhado:
         with st.expander("🐞 Ver Log de Depuração da Extração (para desenvolvedores)"):
             st.json(st.session_state.log_detalhado)
 
+def exibir_selecao_secoes(caminho_pdf):
+    """Mostra as seções detectadas na pré-varredura e permite restringir a análise."""
+    if st.session_state.mapa_secoes is None:
+        try:
+            with st.spinner("🗂️ Identificando as seções do processo..."):
+                st.session_state.mapa_secoes = mapear_secoes(caminho_pdf)
+        except Exception as e:
+            st.session_state.estado_app = "erro"
+            st.session_state.error_message = f"Não foi possível ler o PDF enviado: {str(e)}"
+            st.session_state.error_details = traceback.format_exc()
+            st.rerun()
+    mapa = st.session_state.mapa_secoes
+
+    st.subheader("🗂️ Seções Identificadas no Processo")
+    resumo = pd.DataFrame(resumir_secoes(mapa))
+    resumo["secao"] = resumo["secao"].map(SECOES)
+    resumo.rename(columns={'secao': 'Seção', 'inicio': 'Início', 'fim': 'Fim', 'paginas': 'Páginas'}, inplace=True)
+    st.dataframe(resumo, use_container_width=True, hide_index=True)
+
+    secoes_encontradas = [s for s in SECOES if any(item["secao"] == s for item in mapa)]
+    secoes_escolhidas = st.multiselect(
+        "**Seções a analisar**",
+        options=secoes_encontradas,
+        default=[s for s in SECOES_PADRAO if s in secoes_encontradas],
+        format_func=SECOES.get,
+        help="Deixe vazio (e sem intervalos) para analisar o documento inteiro."
+    )
+    intervalos = st.text_input(
+        "**Páginas adicionais (opcional)**",
+        placeholder="Ex.: 1-10, 25, 40-45"
+    )
+
+    try:
+        paginas = selecionar_paginas(mapa, secoes_escolhidas, intervalos)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    if paginas is None:
+        st.info(f"Todas as {len(mapa)} páginas serão analisadas.")
+    else:
+        st.info(f"{len(paginas)} de {len(mapa)} páginas serão analisadas.")
+
+    if st.button("🚀 Iniciar Análise", use_container_width=True, disabled=paginas == []):
+        st.session_state.paginas_selecionadas = paginas
+        st.session_state.estado_app = "processando"
+        st.rerun()
+
+def exibir_busca_casos():
+    """Permite abrir um processo já analisado sem refazer OCR e extração."""
+    with st.expander("🔎 Consultar processos já analisados"):
+        termo = st.text_input(
+            "**Número do processo, CPF, parte ou verba**",
+            placeholder="Ex.: 0001234-56.2023.5.02.0001, 123.456.789-00, Empresa ABC, Férias"
+        )
+        casos = buscar_casos(termo)
+        if not casos:
+            st.info("Nenhum caso encontrado no índice local.")
+            return
+        for caso in casos:
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.markdown(
+                    f"**{caso['numero_processo'] or 'Sem número'}** — {caso['reclamante'] or 'N/A'} "
+                    f"x {caso['reclamadas'] or 'N/A'}"
+                )
+                st.caption(f"Analisado em {caso['analisado_em']} · {caso['arquivo_origem'] or ''}")
+            with col2:
+                if st.button("Abrir", key=f"abrir_caso_{caso['id']}", use_container_width=True):
+                    st.session_state.dados_completos = carregar_caso(caso["id"])
+                    st.session_state.estado_app = "finalizado"
+                    st.rerun()
+
 # --- INTERFACE PRINCIPAL ---
 
 def main():
@@ -265,11 +513,12 @@ def main():
         if st.session_state.log_detalhado:
             with st.expander("Ver log de depuração da extração"):
                 st.json(st.session_state.log_detalhado)
+        exibir_consumo_tokens()
 
     elif st.session_state.estado_app == "processando":
         caminho_temp_pdf = os.path.join("export", "temp.pdf")
         if os.path.exists(caminho_temp_pdf):
-             executar_analise_completa(caminho_temp_pdf)
+             executar_analise_completa(caminho_temp_pdf, st.session_state.paginas_selecionadas)
              st.rerun()
         else:
             st.error("Arquivo PDF não encontrado. Por favor, faça o upload novamente.")
@@ -277,6 +526,8 @@ def main():
             st.rerun()
 
     elif st.session_state.estado_app == "inicial":
+        exibir_busca_casos()
+
         pdf_file = st.file_uploader(
             label="**Faça o upload do processo trabalhista (formato PDF)**",
             type="pdf",
@@ -287,11 +538,16 @@ def main():
             os.makedirs("export", exist_ok=True)
             
             caminho_temp_pdf = os.path.join("export", "temp.pdf")
-            with open(caminho_temp_pdf, "wb") as f:
-                f.write(pdf_file.getbuffer())
-            
-            st.session_state.estado_app = "processando"
-            st.rerun()
+            # Grava o arquivo apenas quando um novo upload é feito, preservando a pré-varredura.
+            identificador_arquivo = f"{pdf_file.name}-{pdf_file.size}"
+            if st.session_state.get("arquivo_carregado") != identificador_arquivo:
+                with open(caminho_temp_pdf, "wb") as f:
+                    f.write(pdf_file.getbuffer())
+                st.session_state.arquivo_carregado = identificador_arquivo
+                st.session_state.nome_arquivo = pdf_file.name
+                st.session_state.mapa_secoes = None
+
+            exibir_selecao_secoes(caminho_temp_pdf)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+# ===================================================================
+# app/json_incremental.py (Validação Incremental de JSON)
+#
+# O que faz:
+# - ANÁLISE EM STREAMING: Recebe o texto da resposta da IA pedaço por
+#   pedaço e valida a estrutura do JSON à medida que ele chega, sem
+#   esperar a resposta completa.
+# - DETECÇÃO PRECOCE DE ERROS: Qualquer erro estrutural (caractere
+#   inesperado, chave sem aspas, colchete fechado no lugar errado,
+#   texto após o fim do JSON) é detectado no exato pedaço em que
+#   aparece, permitindo abortar a chamada e tentar de novo.
+# - DETECÇÃO DE TRUNCAMENTO: Ao final do stream, um JSON com
+#   estruturas ainda abertas é reportado como truncado.
+# - RESULTADOS PARCIAIS: `parcial()` fecha provisoriamente as
+#   estruturas abertas e devolve o maior objeto válido recebido até
+#   o momento, para exibição progressiva na interface.
+# ===================================================================
+
+import json
+import re
+
+_INICIO_LITERAL = set("-0123456789tfn")
+_CARACTERES_LITERAL = set("-+.0123456789eEtrufalsn")
+_LITERAL_VALIDO = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?|true|false|null")
+
+
+class ErroJSONIncremental(ValueError):
+    """Erro estrutural ou truncamento detectado durante a análise incremental."""
+
+    def __init__(self, mensagem, resposta_bruta="", truncado=False):
+        super().__init__(mensagem)
+        self.resposta_bruta = resposta_bruta
+        self.truncado = truncado
+
+
+class AnalisadorJSONIncremental:
+    """
+    Valida um documento JSON recebido em pedaços.
+
+    Uso:
+        analisador = AnalisadorJSONIncremental()
+        for pedaco in resposta:
+            analisador.alimentar(pedaco.text)   # levanta ErroJSONIncremental cedo
+        dados = analisador.finalizar()          # levanta se estiver truncado
+    """
+
+    def __init__(self):
+        self.texto = ""
+        self.completo = False
+        self._pilha = []
+        self._esperado = "valor"
+        self._em_string = False
+        self._string_e_chave = False
+        self._escape = False
+        self._literal = ""
+        # Último ponto (vírgula fora de string) onde o JSON pode ser cortado com segurança.
+        self._ultimo_corte = None
+
+    def alimentar(self, pedaco):
+        """Acrescenta um pedaço de texto e valida sua estrutura."""
+        inicio = len(self.texto)
+        self.texto += pedaco
+        for deslocamento, caractere in enumerate(pedaco):
+            self._processar(caractere, inicio + deslocamento)
+
+    def finalizar(self):
+        """
+        Conclui a análise e devolve o objeto JSON completo.
+
+        Raises:
+            ErroJSONIncremental: Se a resposta estiver vazia, truncada ou inválida.
+        """
+        if self._literal:
+            self._fechar_literal()
+        if not self.texto.strip():
+            raise ErroJSONIncremental("A resposta da IA veio vazia.", self.texto, truncado=True)
+        if not self.completo:
+            raise ErroJSONIncremental(
+                f"Resposta truncada: {len(self._pilha)} estrutura(s) JSON não foram fechadas.",
+                self.texto,
+                truncado=True,
+            )
+        try:
+            return json.loads(self.texto)
+        except json.JSONDecodeError as e:
+            raise ErroJSONIncremental(f"JSON inválido: {e}", self.texto) from e
+
+    def parcial(self):
+        """
+        Devolve o maior objeto válido que pode ser montado com o texto recebido.
+
+        Returns:
+            dict | list | None: O objeto parcial, ou None se ainda não há nada utilizável.
+        """
+        if self.completo:
+            try:
+                return json.loads(self.texto)
+            except json.JSONDecodeError:
+                return None
+        if not self._pilha:
+            return None
+
+        texto = self.texto
+        if self._em_string:
+            texto = (texto[:-1] if self._escape else texto) + '"'
+        candidatos = [texto + self._fechamentos(self._pilha)]
+        if self._ultimo_corte:
+            indice, pilha = self._ultimo_corte
+            candidatos.append(self.texto[:indice] + self._fechamentos(pilha))
+
+        for candidato in candidatos:
+            try:
+                return json.loads(candidato)
+            except json.JSONDecodeError:
+                continue
+        return None
+
+    # --- Máquina de estados ---
+
+    @staticmethod
+    def _fechamentos(pilha):
+        return "".join("}" if abertura == "{" else "]" for abertura in reversed(pilha))
+
+    def _erro(self, mensagem, posicao):
+        raise ErroJSONIncremental(f"{mensagem} (posição {posicao}).", self.texto)
+
+    def _fim_de_valor(self):
+        if self._pilha:
+            self._esperado = "virgula_ou_fim"
+        else:
+            self.completo = True
+            self._esperado = None
+
+    def _fechar_literal(self, posicao=None):
+        if not _LITERAL_VALIDO.fullmatch(self._literal):
+            self._erro(f"Valor inválido '{self._literal}'", posicao if posicao is not None else len(self.texto))
+        self._literal = ""
+        self._fim_de_valor()
+
+    def _processar(self, caractere, posicao):
+        if self._em_string:
+            if self._escape:
+                self._escape = False
+            elif caractere == "\\":
+                self._escape = True
+            elif caractere == '"':
+                self._em_string = False
+                if self._string_e_chave:
+                    self._esperado = "dois_pontos"
+                else:
+                    self._fim_de_valor()
+            elif caractere < " ":
+                self._erro("Caractere de controle dentro de string", posicao)
+            return
+
+        if self._literal:
+            if caractere in _CARACTERES_LITERAL:
+                self._literal += caractere
+                return
+            self._fechar_literal(posicao)
+
+        if caractere.isspace():
+            return
+        if self.completo:
+            self._erro("Conteúdo inesperado após o fim do JSON", posicao)
+
+        esperado = self._esperado
+        aceita_valor = esperado in ("valor", "valor_ou_fim")
+
+        if caractere == '"':
+            if aceita_valor:
+                self._string_e_chave = False
+            elif esperado in ("chave", "chave_ou_fim"):
+                self._string_e_chave = True
+            else:
+                self._erro("String inesperada", posicao)
+            self._em_string = True
+        elif caractere in "{[":
+            if not aceita_valor:
+                self._erro(f"'{caractere}' inesperado", posicao)
+            self._pilha.append(caractere)
+            self._esperado = "chave_ou_fim" if caractere == "{" else "valor_ou_fim"
+        elif caractere in "}]":
+            abertura = "{" if caractere == "}" else "["
+            fim_vazio = "chave_ou_fim" if caractere == "}" else "valor_ou_fim"
+            if not self._pilha or self._pilha[-1] != abertura or esperado not in ("virgula_ou_fim", fim_vazio):
+                self._erro(f"'{caractere}' inesperado", posicao)
+            self._pilha.pop()
+            self._fim_de_valor()
+        elif caractere == ":":
+            if esperado != "dois_pontos":
+                self._erro("':' inesperado", posicao)
+            self._esperado = "valor"
+        elif caractere == ",":
+            if esperado != "virgula_ou_fim":
+                self._erro("',' inesperada", posicao)
+            self._ultimo_corte = (posicao, tuple(self._pilha))
+            self._esperado = "chave" if self._pilha[-1] == "{" else "valor"
+        elif caractere in _INICIO_LITERAL:
+            if not aceita_valor:
+                self._erro(f"Valor inesperado '{caractere}'", posicao)
+            self._literal = caractere
+        else:
+            self._erro(f"Caractere inesperado '{caractere}'", posicao)
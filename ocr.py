@@ -37,54 +37,77 @@ def _preprocessar_imagem(imagem_pil):
         print(f"⚠️  Aviso: Falha no pré-processamento da imagem. Usando imagem original. Erro: {e}")
         return imagem_pil # Retorna a imagem original em caso de erro
 
-def aplicar_ocr(caminho_pdf):
+def aplicar_ocr(caminho_pdf, paginas=None, token=None, ao_progresso=None):
     """
     Extrai texto de um arquivo PDF usando uma estratégia híbrida.
 
     Args:
         caminho_pdf (str): O caminho para o arquivo PDF a ser processado.
+        paginas (list[int] | None): Páginas (1-based) a processar, por exemplo
+            as selecionadas em `secoes.selecionar_paginas`. Se None, processa
+            o documento inteiro.
+        token (TokenCancelamento | None): Verificado antes de cada página.
+        ao_progresso (callable | None): Chamado como `ao_progresso(processadas, total)`
+            após cada página.
 
     Returns:
         str: O texto completo extraído do documento.
+
+    Raises:
+        AnaliseCancelada: Se o cancelamento for solicitado pelo `token`.
     """
     print("🚀 Iniciando extração de texto com estratégia híbrida...")
     texto_completo = []
     documento = fitz.open(caminho_pdf)
+    paginas_selecionadas = set(paginas) if paginas is not None else None
+    if paginas_selecionadas is not None:
+        print(f"   - Processando {len(paginas_selecionadas)} de {len(documento)} páginas selecionadas.")
+    total_a_processar = len(paginas_selecionadas) if paginas_selecionadas is not None else len(documento)
 
-    # Itera por cada página do documento
-    for num_pagina, pagina in enumerate(documento):
-        # --- Passo 1: Tenta extrair o texto diretamente ---
-        # Isso funciona para páginas que foram geradas digitalmente (ex: de um Word)
-        texto_direto = pagina.get_text("text")
+    try:
+        # Itera por cada página do documento
+        for num_pagina, pagina in enumerate(documento):
+            if paginas_selecionadas is not None and (num_pagina + 1) not in paginas_selecionadas:
+                continue
+            if token:
+                token.verificar()
 
-        # --- Passo 2: Decide se usa OCR ---
-        # Se a página tem pouco ou nenhum texto (< 100 caracteres),
-        # consideramos que é uma imagem que precisa de OCR.
-        if len(texto_direto.strip()) < 100:
-            print(f"   - Página {num_pagina + 1}/{len(documento)}: Texto não encontrado. Aplicando OCR...")
-            
-            # Renderiza a página como uma imagem de alta resolução (300 DPI)
-            pix = pagina.get_pixmap(dpi=300)
-            img_bytes = pix.tobytes("png")
-            imagem_pil = Image.open(io.BytesIO(img_bytes))
+            # --- Passo 1: Tenta extrair o texto diretamente ---
+            # Isso funciona para páginas que foram geradas digitalmente (ex: de um Word)
+            texto_direto = pagina.get_text("text")
 
-            # Aplica o pré-processamento na imagem
-            imagem_processada = _preprocessar_imagem(imagem_pil)
+            # --- Passo 2: Decide se usa OCR ---
+            # Se a página tem pouco ou nenhum texto (< 100 caracteres),
+            # consideramos que é uma imagem que precisa de OCR.
+            if len(texto_direto.strip()) < 100:
+                print(f"   - Página {num_pagina + 1}/{len(documento)}: Texto não encontrado. Aplicando OCR...")
+                
+                # Renderiza a página como uma imagem de alta resolução (300 DPI)
+                pix = pagina.get_pixmap(dpi=300)
+                img_bytes = pix.tobytes("png")
+                imagem_pil = Image.open(io.BytesIO(img_bytes))
 
-            # Usa o Tesseract para extrair texto da imagem
-            try:
-                texto_da_pagina = pytesseract.image_to_string(imagem_processada, lang='por')
-                texto_completo.append(texto_da_pagina)
-            except pytesseract.TesseractError as e:
-                print(f"❌ Erro de OCR na página {num_pagina + 1}: {e}")
-                texto_completo.append(f"\n[ERRO DE OCR NA PÁGINA {num_pagina + 1}]\n")
-        
-        # Se a página já continha texto digital, usa-o diretamente
-        else:
-            print(f"   - Página {num_pagina + 1}/{len(documento)}: Texto digital extraído diretamente.")
-            texto_completo.append(texto_direto)
+                # Aplica o pré-processamento na imagem
+                imagem_processada = _preprocessar_imagem(imagem_pil)
+
+                # Usa o Tesseract para extrair texto da imagem
+                try:
+                    texto_da_pagina = pytesseract.image_to_string(imagem_processada, lang='por')
+                    texto_completo.append(texto_da_pagina)
+                except pytesseract.TesseractError as e:
+                    print(f"❌ Erro de OCR na página {num_pagina + 1}: {e}")
+                    texto_completo.append(f"\n[ERRO DE OCR NA PÁGINA {num_pagina + 1}]\n")
+            
+            # Se a página já continha texto digital, usa-o diretamente
+            else:
+                print(f"   - Página {num_pagina + 1}/{len(documento)}: Texto digital extraído diretamente.")
+                texto_completo.append(texto_direto)
+
+            if ao_progresso:
+                ao_progresso(len(texto_completo), total_a_processar)
+    finally:
+        documento.close()
 
-    documento.close()
     print("✅ Extração de texto finalizada.")
     
     # Junta o texto de todas as páginas, separando-as com um marcador de quebra de página
@@ -0,0 +1,138 @@
+# ===================================================================
+# app/orcamento_tokens.py (Contagem e Orçamento de Tokens)
+#
+# O que faz:
+# - CONTAGEM: Conta os tokens de um texto com o `count_tokens` do
+#   modelo ou, se indisponível, com um estimador local baseado em
+#   caracteres por token.
+# - CHUNKS NO TAMANHO CERTO: Calibra a razão caracteres/token com uma
+#   amostra do próprio documento e calcula o tamanho de chunk que
+#   leva cada chamada `PROMPT_EXTRACAO + chunk` ao alvo de tokens.
+# - PAYLOAD COMPACTO: Remove chaves vazias e campos nulos dos JSONs
+#   parciais e os serializa sem indentação antes da consolidação.
+# - RELATÓRIO: Registra tokens de entrada/saída e latência de cada
+#   chamada ao modelo, com totais por documento.
+# ===================================================================
+
+import json
+import math
+
+# Estimativa local usada quando o contador do modelo não está disponível.
+CARACTERES_POR_TOKEN = 4.0
+# Alvo de tokens de entrada por chamada de extração (prompt + chunk).
+TOKENS_POR_CHAMADA = 3500
+# Orçamento de tokens de entrada para uma única chamada de consolidação.
+TOKENS_MAX_CONSOLIDACAO = 120000
+# Profundidade máxima de divisões da consolidação em metades.
+MAX_NIVEIS_CONSOLIDACAO = 3
+# Uma nova divisão só é feita se o payload tiver encolhido ao menos para esta fração do anterior.
+FATOR_REDUCAO_CONSOLIDACAO = 0.75
+# Limites do tamanho de chunk, em caracteres.
+TAMANHO_MIN_CHUNK = 2000
+TAMANHO_MAX_CHUNK = 100000
+# Tamanho da amostra do documento usada para calibrar a razão caracteres/token.
+TAMANHO_AMOSTRA = 20000
+
+
+def estimar_tokens(texto, caracteres_por_token=CARACTERES_POR_TOKEN):
+    """Estima localmente a quantidade de tokens de um texto."""
+    return math.ceil(len(texto or "") / caracteres_por_token)
+
+
+def contar_tokens(model, texto):
+    """
+    Conta os tokens de um texto usando o contador do modelo.
+
+    Returns:
+        tuple[int, bool]: A quantidade de tokens e se o valor é uma estimativa local.
+    """
+    try:
+        return model.count_tokens(texto).total_tokens, False
+    except Exception as e:
+        print(f"⚠️  Contador de tokens do modelo indisponível ({e}). Usando estimativa local.")
+        return estimar_tokens(texto), True
+
+
+def medir_caracteres_por_token(model, amostra):
+    """Calibra a razão caracteres/token com uma amostra do documento."""
+    amostra = (amostra or "")[:TAMANHO_AMOSTRA]
+    if not amostra.strip():
+        return CARACTERES_POR_TOKEN
+    tokens, estimado = contar_tokens(model, amostra)
+    if estimado or not tokens:
+        return CARACTERES_POR_TOKEN
+    return len(amostra) / tokens
+
+
+def calcular_tamanho_chunk(tokens_por_chamada, tokens_prompt, caracteres_por_token=CARACTERES_POR_TOKEN):
+    """Calcula o tamanho de chunk (em caracteres) que leva cada chamada ao alvo de tokens."""
+    tamanho = int((tokens_por_chamada - tokens_prompt) * caracteres_por_token)
+    return max(TAMANHO_MIN_CHUNK, min(TAMANHO_MAX_CHUNK, tamanho))
+
+
+def remover_vazios(dados):
+    """Remove recursivamente campos nulos, strings vazias e listas/dicionários vazios."""
+    if isinstance(dados, dict):
+        limpo = {k: remover_vazios(v) for k, v in dados.items()}
+        return {k: v for k, v in limpo.items() if v not in (None, "", [], {})}
+    if isinstance(dados, list):
+        limpo = [remover_vazios(item) for item in dados]
+        return [item for item in limpo if item not in (None, "", [], {})]
+    return dados
+
+
+def compactar_json(dados):
+    """Serializa os dados sem campos vazios e sem espaços, para economizar tokens."""
+    return json.dumps(remover_vazios(dados), ensure_ascii=False, separators=(",", ":"))
+
+
+class RelatorioTokens:
+    """Acumula os tokens e a latência de cada chamada ao modelo durante a análise de um documento."""
+
+    def __init__(self):
+        self.chamadas = []
+
+    def registrar(self, etapa, tokens_entrada, tokens_saida, latencia, estimado=False, status="Sucesso"):
+        self.chamadas.append({
+            "etapa": etapa,
+            "status": status,
+            "tokens_entrada": tokens_entrada,
+            "tokens_saida": tokens_saida,
+            "latencia_s": round(latencia, 2),
+            "estimado": estimado,
+        })
+
+    def registrar_resposta(self, etapa, resposta, prompt, texto_resposta, latencia, status="Sucesso"):
+        """Registra uma chamada a partir do `usage_metadata` da resposta, estimando se ele faltar."""
+        try:
+            uso = resposta.usage_metadata
+            tokens_entrada = uso.prompt_token_count
+            tokens_saida = uso.candidates_token_count
+        except Exception:
+            tokens_entrada = tokens_saida = None
+
+        estimado = not tokens_entrada
+        if estimado:
+            tokens_entrada = estimar_tokens(prompt)
+            tokens_saida = estimar_tokens(texto_resposta)
+        self.registrar(etapa, tokens_entrada, tokens_saida or 0, latencia, estimado, status)
+
+    def totais(self):
+        """Retorna os totais do documento."""
+        entrada = sum(c["tokens_entrada"] for c in self.chamadas)
+        saida = sum(c["tokens_saida"] for c in self.chamadas)
+        return {
+            "chamadas": len(self.chamadas),
+            "tokens_entrada": entrada,
+            "tokens_saida": saida,
+            "tokens_total": entrada + saida,
+            "latencia_total_s": round(sum(c["latencia_s"] for c in self.chamadas), 2),
+            "estimado": any(c["estimado"] for c in self.chamadas),
+        }
+
+    def resumo(self):
+        """Resumo de uma linha para o log do console."""
+        t = self.totais()
+        aproximado = " (parcialmente estimado)" if t["estimado"] else ""
+        return (f"📊 {t['chamadas']} chamadas | {t['tokens_entrada']} tokens de entrada, "
+                f"{t['tokens_saida']} de saída{aproximado} | {t['latencia_total_s']}s na API")
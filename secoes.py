@@ -0,0 +1,320 @@
+# ===================================================================
+# app/secoes.py (Pré-análise e Seleção de Seções do Processo)
+#
+# O que faz:
+# - PRÉ-VARREDURA RÁPIDA: Antes do OCR, percorre o PDF usando apenas
+#   o índice (bookmarks) exportado pelo PJe e o texto digital das
+#   páginas, sem renderizar imagens. Leva segundos mesmo em autos
+#   com centenas de páginas.
+# - CLASSIFICAÇÃO DE SEÇÕES: Cada página recebe um rótulo (petição
+#   inicial, sentença, acórdão, contestação, ...) a partir de três
+#   fontes, nesta ordem de prioridade:
+#   1. Índice do PDF (bookmarks do PJe).
+#   2. Cabeçalho da página (primeiras linhas do texto).
+#   3. Classificador leve por palavras-chave no texto da página.
+#   Páginas sem indício próprio herdam o rótulo do documento anterior.
+# - SELEÇÃO: Permite restringir o OCR e a extração às seções e/ou
+#   intervalos de páginas escolhidos pelo usuário.
+# ===================================================================
+
+import re
+import sys
+import unicodedata
+
+# --- Rótulos de Seção ---
+SECOES = {
+    "peticao_inicial": "Petição Inicial",
+    "contestacao": "Contestação",
+    "ata_audiencia": "Ata de Audiência",
+    "sentenca": "Sentença",
+    "embargos_declaracao": "Embargos de Declaração",
+    "recurso": "Recurso",
+    "acordao": "Acórdão",
+    "despacho_decisao": "Despacho / Decisão",
+    "calculos": "Cálculos",
+    "procuracao": "Procuração / Substabelecimento",
+    "outros": "Outros Documentos",
+}
+
+# Seções que realmente importam para o cálculo no PJe-Calc.
+SECOES_PADRAO = ["peticao_inicial", "sentenca", "acordao"]
+
+# --- Palavras-chave do Classificador ---
+# Cada seção tem uma lista de (padrão, peso). Os padrões são aplicados
+# sobre o texto normalizado (maiúsculas, sem acentos). A ordem do
+# dicionário desempata seções com a mesma pontuação.
+PALAVRAS_CHAVE = {
+    "acordao": [
+        (r"\bACORDAO\b", 5),
+        (r"\bEMENTA\b", 3),
+        (r"RELATADOS E DISCUTIDOS", 4),
+        (r"\bDESEMBARGADOR", 2),
+        (r"\bTURMA\b", 1),
+    ],
+    "sentenca": [
+        (r"\bSENTENCA\b", 5),
+        (r"JULGO (PARCIALMENTE )?(PROCEDENTE|IMPROCEDENTE)", 4),
+        (r"\bDISPOSITIVO\b", 2),
+        (r"\bFUNDAMENTACAO\b", 1),
+        (r"\bVISTOS\b", 1),
+    ],
+    "embargos_declaracao": [
+        (r"EMBARGOS DE DECLARACAO", 5),
+    ],
+    "recurso": [
+        (r"RECURSO ORDINARIO", 5),
+        (r"RECURSO DE REVISTA", 5),
+        (r"AGRAVO DE (PETICAO|INSTRUMENTO)", 5),
+        (r"RAZOES (DO|DE) RECURSO", 3),
+        (r"CONTRARRAZOES", 3),
+    ],
+    "contestacao": [
+        (r"\bCONTESTACAO\b", 5),
+        (r"\bDEFESA\b", 1),
+    ],
+    "ata_audiencia": [
+        (r"ATA DE AUDIENCIA", 5),
+        (r"\bAUDIENCIA\b", 1),
+    ],
+    "peticao_inicial": [
+        (r"PETICAO INICIAL", 5),
+        (r"RECLAMACAO TRABALHISTA", 3),
+        (r"\bEXCELENTISSIMO", 2),
+        (r"VEM,? RESPEITOSAMENTE", 2),
+        (r"\bDOS PEDIDOS\b", 2),
+    ],
+    "despacho_decisao": [
+        (r"\bDESPACHO\b", 4),
+        (r"\bDECISAO\b", 2),
+    ],
+    "calculos": [
+        (r"PLANILHA DE CALCULO", 5),
+        (r"CALCULOS DE LIQUIDACAO", 5),
+        (r"\bPJE-?CALC\b", 3),
+    ],
+    "procuracao": [
+        (r"\bPROCURACAO\b", 5),
+        (r"\bSUBSTABELECIMENTO\b", 5),
+    ],
+}
+
+# Quantidade de caracteres considerada "cabeçalho" da página.
+LIMITE_CABECALHO = 400
+# Pontuação mínima para o classificador de texto completo aceitar um rótulo.
+PONTUACAO_MINIMA = 4
+
+# Rodapé padrão do PJe: "... - Num. 12345678 - Pág. 1"
+_RODAPE_PJE = re.compile(r"NUM\.\s*(\d+)\s*-\s*PAG\.\s*(\d+)")
+
+
+def _normalizar(texto):
+    """Coloca o texto em maiúsculas e remove acentos para comparação."""
+    sem_acentos = unicodedata.normalize("NFKD", texto or "")
+    sem_acentos = "".join(c for c in sem_acentos if not unicodedata.combining(c))
+    return sem_acentos.upper()
+
+
+def _pontuar(texto_normalizado):
+    """Retorna a pontuação de cada seção para um texto já normalizado."""
+    pontuacao = {}
+    for secao, padroes in PALAVRAS_CHAVE.items():
+        total = sum(peso for padrao, peso in padroes if re.search(padrao, texto_normalizado))
+        if total:
+            pontuacao[secao] = total
+    return pontuacao
+
+
+def classificar_texto(texto, pontuacao_minima=1):
+    """
+    Classifica um trecho de texto em uma das seções conhecidas.
+
+    Returns:
+        str | None: A chave da seção mais provável ou None se nenhuma
+        atingir a pontuação mínima.
+    """
+    pontuacao = _pontuar(_normalizar(texto))
+    if not pontuacao:
+        return None
+    melhor = max(pontuacao, key=pontuacao.get)
+    return melhor if pontuacao[melhor] >= pontuacao_minima else None
+
+
+def _rotulos_pelo_indice(indice, total_paginas):
+    """
+    Converte o índice (bookmarks) do PDF em um rótulo por página.
+
+    Só entram os bookmarks cujo título é reconhecido pelo classificador.
+    Páginas sob títulos genéricos ("Documento 123", número do processo)
+    ficam de fora e são rotuladas pelo cabeçalho e pelas palavras-chave.
+
+    Returns:
+        dict: {numero_pagina (1-based): secao}
+    """
+    entradas = sorted(
+        [(pagina, titulo) for _, titulo, pagina in indice if 1 <= pagina <= total_paginas],
+        key=lambda e: e[0],
+    )
+    rotulos = {}
+    for i, (inicio, titulo) in enumerate(entradas):
+        # O documento vai até a página anterior ao próximo bookmark com início diferente.
+        fim = total_paginas
+        for proximo_inicio, _ in entradas[i + 1:]:
+            if proximo_inicio > inicio:
+                fim = proximo_inicio - 1
+                break
+        secao = classificar_texto(titulo)
+        if secao:
+            for num in range(inicio, fim + 1):
+                rotulos[num] = secao
+    return rotulos
+
+
+def classificar_paginas(textos, rotulos_indice=None):
+    """
+    Rotula cada página a partir do seu texto e, se houver, do índice do PDF.
+
+    O cabeçalho e o texto completo só definem a seção no início de um documento
+    (página 1 ou rodapé do PJe indicando um novo documento). No meio de um
+    documento, apenas um cabeçalho com pontuação forte (`PONTUACAO_MINIMA`)
+    substitui a seção herdada, para que menções soltas como "decisão" ou
+    "audiência" não reclassifiquem páginas da petição ou da sentença.
+
+    Args:
+        textos (list[str]): O texto digital de cada página, em ordem.
+        rotulos_indice (dict | None): {numero_pagina: secao} vindo do índice.
+
+    Returns:
+        list[dict]: Uma entrada por página com as chaves "pagina" (1-based),
+        "secao" e "origem" ("indice", "cabecalho", "palavras_chave",
+        "continuacao" ou "desconhecida").
+    """
+    rotulos_indice = rotulos_indice or {}
+    mapa = []
+    secao_atual, documento_atual = "outros", None
+    for num_pagina, texto in enumerate(textos, start=1):
+        rodape = _RODAPE_PJE.search(_normalizar(texto))
+        id_documento = rodape.group(1) if rodape else None
+        novo_documento = bool(rodape) and (rodape.group(2) == "1" or id_documento != documento_atual)
+        inicio_documento = novo_documento or num_pagina == 1
+        cabecalho = texto[:LIMITE_CABECALHO]
+
+        if num_pagina in rotulos_indice:
+            secao, origem = rotulos_indice[num_pagina], "indice"
+        elif inicio_documento and (secao_cabecalho := classificar_texto(cabecalho)):
+            secao, origem = secao_cabecalho, "cabecalho"
+        elif inicio_documento and (secao_texto := classificar_texto(texto, PONTUACAO_MINIMA)):
+            secao, origem = secao_texto, "palavras_chave"
+        elif not inicio_documento and (secao_cabecalho := classificar_texto(cabecalho, PONTUACAO_MINIMA)):
+            secao, origem = secao_cabecalho, "cabecalho"
+        elif not novo_documento:
+            # Páginas digitalizadas (sem texto) ou sem indícios fortes seguem o documento anterior.
+            secao, origem = secao_atual, "continuacao"
+        else:
+            secao, origem = "outros", "desconhecida"
+
+        mapa.append({"pagina": num_pagina, "secao": secao, "origem": origem})
+        secao_atual = secao
+        if id_documento:
+            documento_atual = id_documento
+    return mapa
+
+
+def mapear_secoes(caminho_pdf):
+    """
+    Faz a pré-varredura do PDF e rotula cada página com uma seção.
+
+    Args:
+        caminho_pdf (str): O caminho para o arquivo PDF.
+
+    Returns:
+        list[dict]: O mapa página a página, no formato de `classificar_paginas`.
+    """
+    import fitz  # PyMuPDF; importado aqui para que a classificação possa ser usada sem ele
+
+    documento = fitz.open(caminho_pdf)
+    try:
+        rotulos_indice = _rotulos_pelo_indice(documento.get_toc(), len(documento))
+        textos = [pagina.get_text("text") for pagina in documento]
+    finally:
+        documento.close()
+    return classificar_paginas(textos, rotulos_indice)
+
+
+def resumir_secoes(mapa):
+    """
+    Agrupa o mapa página-a-página em intervalos contíguos por seção.
+
+    Returns:
+        list[dict]: Itens com "secao", "inicio", "fim" e "paginas".
+    """
+    resumo = []
+    for item in mapa:
+        if resumo and resumo[-1]["secao"] == item["secao"] and resumo[-1]["fim"] == item["pagina"] - 1:
+            resumo[-1]["fim"] = item["pagina"]
+        else:
+            resumo.append({"secao": item["secao"], "inicio": item["pagina"], "fim": item["pagina"]})
+    for grupo in resumo:
+        grupo["paginas"] = grupo["fim"] - grupo["inicio"] + 1
+    return resumo
+
+
+def interpretar_intervalos(texto_intervalos):
+    """
+    Converte uma descrição como "1-10, 25, 40-45" em um conjunto de páginas.
+
+    Raises:
+        ValueError: Se algum trecho não for um número ou intervalo válido.
+    """
+    paginas = set()
+    for parte in (texto_intervalos or "").replace(";", ",").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        correspondencia = re.fullmatch(r"(\d+)\s*-\s*(\d+)|(\d+)", parte)
+        if not correspondencia:
+            raise ValueError(f"Intervalo de páginas inválido: '{parte}'")
+        if correspondencia.group(3):
+            paginas.add(int(correspondencia.group(3)))
+        else:
+            inicio, fim = int(correspondencia.group(1)), int(correspondencia.group(2))
+            if inicio > fim:
+                raise ValueError(f"Intervalo de páginas inválido: '{parte}'")
+            paginas.update(range(inicio, fim + 1))
+    return paginas
+
+
+def selecionar_paginas(mapa, secoes=None, intervalos=None):
+    """
+    Define quais páginas devem passar por OCR e extração.
+
+    Args:
+        mapa (list[dict]): O resultado de `mapear_secoes`.
+        secoes (list[str] | None): Seções desejadas.
+        intervalos (str | set[int] | None): Intervalos de páginas adicionais,
+            no formato aceito por `interpretar_intervalos` ou já como conjunto.
+
+    Returns:
+        list[int] | None: Páginas (1-based) em ordem, ou None se nenhum
+        filtro foi informado (processar o documento inteiro).
+    """
+    if not secoes and not intervalos:
+        return None
+    if isinstance(intervalos, str):
+        intervalos = interpretar_intervalos(intervalos)
+
+    total_paginas = len(mapa)
+    paginas = {item["pagina"] for item in mapa if secoes and item["secao"] in secoes}
+    paginas.update(p for p in (intervalos or ()) if 1 <= p <= total_paginas)
+    return sorted(paginas)
+
+
+if __name__ == "__main__":
+    # Uso: python secoes.py processo.pdf
+    if len(sys.argv) != 2:
+        print("Uso: python secoes.py <caminho_do_pdf>")
+        sys.exit(1)
+    mapa_pdf = mapear_secoes(sys.argv[1])
+    for grupo in resumir_secoes(mapa_pdf):
+        print(f"   - Páginas {grupo['inicio']}-{grupo['fim']} ({grupo['paginas']}): {SECOES[grupo['secao']]}")
+    selecionadas = selecionar_paginas(mapa_pdf, SECOES_PADRAO) or []
+    print(f"✅ {len(selecionadas)} de {len(mapa_pdf)} páginas nas seções padrão: {', '.join(SECOES_PADRAO)}")
@@ -0,0 +1,63 @@
+from secoes import SECOES_PADRAO, _rotulos_pelo_indice, classificar_paginas, selecionar_paginas
+
+
+def _pagina(texto, num_documento, pagina):
+    return f"{texto}\n\nAssinado eletronicamente por: Fulano - Num. {num_documento} - Pág. {pagina}"
+
+
+def test_palavras_fracas_no_meio_do_documento_nao_reclassificam_paginas():
+    textos = [
+        _pagina("EXCELENTÍSSIMO SENHOR JUIZ\nRECLAMAÇÃO TRABALHISTA\nvem, respeitosamente", 111, 1),
+        _pagina("conforme a decisão do TST, a jornada deve ser considerada...", 111, 2),
+        _pagina("o reclamante compareceu à audiência anterior e ...", 111, 3),
+        _pagina("CONTESTAÇÃO\nA reclamada apresenta sua defesa", 222, 1),
+        _pagina("SENTENÇA\nVistos etc.", 333, 1),
+        _pagina("FUNDAMENTAÇÃO\nDas horas extras...", 333, 2),
+        _pagina("rejeito os argumentos da defesa e JULGO PROCEDENTES os pedidos", 333, 3),
+    ]
+
+    mapa = classificar_paginas(textos)
+
+    assert [item["secao"] for item in mapa] == [
+        "peticao_inicial", "peticao_inicial", "peticao_inicial",
+        "contestacao",
+        "sentenca", "sentenca", "sentenca",
+    ]
+    assert selecionar_paginas(mapa, SECOES_PADRAO) == [1, 2, 3, 5, 6, 7]
+
+
+def test_cabecalho_forte_no_meio_do_documento_inicia_nova_secao():
+    textos = [
+        "EXCELENTÍSSIMO SENHOR JUIZ\nRECLAMAÇÃO TRABALHISTA",
+        "Dos fatos...",
+        "SENTENÇA\nVistos etc.",
+    ]
+
+    mapa = classificar_paginas(textos)
+
+    assert [item["secao"] for item in mapa] == ["peticao_inicial", "peticao_inicial", "sentenca"]
+
+
+def test_bookmark_generico_nao_impede_a_classificacao_das_paginas():
+    textos = [
+        "EXCELENTÍSSIMO SENHOR JUIZ\nRECLAMAÇÃO TRABALHISTA",
+        "Dos pedidos...",
+        "SENTENÇA\nVistos etc.",
+        "JULGO PROCEDENTES os pedidos",
+    ]
+    indice = [[1, "Processo 0001234-56.2023.5.02.0001", 1]]
+
+    mapa = classificar_paginas(textos, _rotulos_pelo_indice(indice, len(textos)))
+
+    assert [item["secao"] for item in mapa] == ["peticao_inicial", "peticao_inicial", "sentenca", "sentenca"]
+    assert selecionar_paginas(mapa, SECOES_PADRAO) == [1, 2, 3, 4]
+
+
+def test_bookmark_reconhecido_prevalece_sobre_o_texto():
+    textos = ["texto sem indícios", "mais texto", "SENTENÇA\nVistos etc."]
+    indice = [[1, "Documento 123", 1], [1, "Acórdão", 2]]
+
+    mapa = classificar_paginas(textos, _rotulos_pelo_indice(indice, len(textos)))
+
+    assert [item["secao"] for item in mapa] == ["outros", "acordao", "acordao"]
+    assert [item["origem"] for item in mapa[1:]] == ["indice", "indice"]